@@ -1,13 +1,90 @@
 
 import ast
-import copy
 import json
 import os
 import random
+import re
+import sys
+from functools import lru_cache
+from operator import itemgetter
 from typing import Any
 from urllib.parse import urlparse
 from astrbot.api import logger
 
+try:
+    import orjson  # 可选依赖，序列化速度远快于标准库
+except ImportError:
+    orjson = None
+
+try:
+    import ahocorasick  # 可选依赖（pyahocorasick），多关键词子串匹配一次线性扫描
+except ImportError:
+    ahocorasick = None
+
+_CACHE_MISS = object()  # 匹配缓存未命中哨兵（None是合法的缓存值）
+
+
+@lru_cache(maxsize=1024)
+def _extract_base_url(full_url: str) -> str:
+    """提取URL的站点域名部分，结果按URL缓存（API地址集合有限，缓存很快饱和）"""
+    parsed = urlparse(full_url)
+    return (
+        f"{parsed.scheme}://{parsed.netloc}"
+        if parsed.scheme and parsed.netloc
+        else full_url
+    )
+
+# api详情字段行：一次正则匹配同时取出字段名和值，代替逐前缀startswith
+_FIELD_RE = re.compile(
+    r"^(API触发词|api匹配词|请求地址|api地址|数据类型|api类型|所需参数|解析路径)[:：](.*)$"
+)
+
+
+def _parse_keyword_field(value: str) -> list:
+    """解析触发词字段，兼容 "['xxx']" 形式和逗号分隔形式"""
+    if value == "无":
+        return []
+    if value.startswith("[") and value.endswith("]"):
+        try:
+            parsed = ast.literal_eval(value)
+            if isinstance(parsed, list):
+                return parsed
+        except Exception:
+            pass
+        return [value]
+    return [k.strip() for k in value.split(",")]
+
+
+def _parse_params_field(value: str) -> dict:
+    """解析所需参数字段，形如 "key=value,key2" """
+    if value == "无":
+        return {}
+    params = {}
+    for kv in value.split(","):
+        if "=" in kv:
+            k, v = kv.split("=", 1)
+            params[k.strip()] = v.strip()
+        else:
+            params[kv.strip()] = ""
+    return params
+
+
+def _parse_plain_field(value: str) -> str:
+    return "" if value == "无" else value
+
+
+# 字段名 -> (api_info键, 值解析函数)
+_FIELD_HANDLERS = {
+    "API触发词": ("keyword", _parse_keyword_field),
+    "api匹配词": ("keyword", _parse_keyword_field),
+    "请求地址": ("url", _parse_plain_field),
+    "api地址": ("url", _parse_plain_field),
+    "数据类型": ("type", _parse_plain_field),
+    "api类型": ("type", _parse_plain_field),
+    "所需参数": ("params", _parse_params_field),
+    "解析路径": ("target", _parse_plain_field),
+}
+
 
 class APIManager:
     """API功能管理器 - 统一管理所有API功能"""
@@ -24,6 +101,21 @@ class APIManager:
         self.apis_file = apis_file
         self.apis = {}
         self.default_api_type = "image"
+        # 关键词索引：精准关键词 -> [(优先级, 触发词)]，模糊关键词单独存放
+        self._exact_index: dict[str, list[tuple[int, str]]] = {}
+        self._fuzzy_keywords: list[tuple[str, int, str]] = []
+        self._fuzzy_automaton = None  # 模糊关键词的Aho-Corasick自动机（依赖可用时）
+        # 匹配结果缓存：触发词 -> 最高优先级候选列表（None表示无匹配）
+        self._match_cache: dict[str, list[str] | None] = {}
+        # 上次写盘内容的哈希，用于跳过无变化的重写
+        self._last_save_hash: int | None = None
+        # 数据版本号，每次索引重建时递增，供外部缓存做失效判断
+        self.version = 0
+        # 标准化配置缓存：触发词 -> 标准化字典（随索引重建）
+        self._normalized: dict[str, dict] = {}
+        # 类型分桶与首关键词列表（随索引重建），供列表展示/提示词注入直接读取
+        self._by_type: dict[str, list[str]] = {t: [] for t in self.ALLOWED_TYPES}
+        self._first_keywords: list[tuple[str, str]] = []
         self.load_data()
 
     def load_data(self):
@@ -40,6 +132,7 @@ class APIManager:
             except json.JSONDecodeError:
                 logger.warning(f"{self.apis_file} 格式错误，尝试从系统默认文件重新初始化")
                 self._initialize_from_system()
+        self._rebuild_index()
 
     def _initialize_from_system(self):
         """从系统默认API文件初始化"""
@@ -57,11 +150,67 @@ class APIManager:
             logger.warning(f"系统默认API文件不存在: {self.system_api_file}")
             self.apis = {}
 
+    def _rebuild_index(self):
+        """重建关键词索引，仅在API功能数据变化时调用，避免每次匹配时遍历全部API"""
+        exact: dict[str, list[tuple[int, str]]] = {}
+        fuzzy: list[tuple[str, int, str]] = []
+        normalized: dict[str, dict] = {}
+        by_type: dict[str, list[str]] = {t: [] for t in self.ALLOWED_TYPES}
+        first_keywords: list[tuple[str, str]] = []
+        for name, raw_api in self.apis.items():
+            keywords = raw_api.get("keyword") or []
+            if isinstance(keywords, str):
+                keywords = [keywords]
+            # 驻留关键词字符串：索引键与消息首词比较可走指针相等的快速路径
+            kws = tuple(sys.intern(k) for k in keywords)
+            priority = raw_api.get("priority", 0)
+            is_fuzzy = raw_api.get("fuzzy", False)
+            for kw in kws:
+                exact.setdefault(kw, []).append((priority, name))
+                if is_fuzzy:
+                    fuzzy.append((kw, priority, name))
+            normalized[name] = self._normalize_raw(name, raw_api)
+            raw_type = raw_api.get("type", "unknown")
+            if raw_type in by_type:
+                by_type[raw_type].append(name)
+            if kws:
+                first_keywords.append((kws[0], raw_api.get("type", "text")))
+        automaton = None
+        if ahocorasick is not None and fuzzy:
+            # 同一关键词可能属于多个API功能，按关键词聚合后再入自动机
+            fuzzy_map: dict[str, list[tuple[int, str]]] = {}
+            for kw, priority, name in fuzzy:
+                fuzzy_map.setdefault(kw, []).append((priority, name))
+            automaton = ahocorasick.Automaton()
+            for kw, entries in fuzzy_map.items():
+                automaton.add_word(kw, entries)
+            automaton.make_automaton()
+        self._exact_index = exact
+        self._fuzzy_keywords = fuzzy
+        self._fuzzy_automaton = automaton
+        self._normalized = normalized
+        self._by_type = by_type
+        self._first_keywords = first_keywords
+        self._match_cache.clear()
+        self.version += 1
+
     def _save_data(self):
-        """保存API功能数据到统一文件"""
+        """保存API功能数据到统一文件（内容未变化时跳过，写临时文件后原子替换）"""
+        if orjson is not None:
+            payload = orjson.dumps(self.apis, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(self.apis, ensure_ascii=False, indent=4).encode("utf-8")
+
+        payload_hash = hash(payload)
+        if payload_hash == self._last_save_hash:
+            return
+
         os.makedirs(os.path.dirname(self.apis_file), exist_ok=True)
-        with open(self.apis_file, "w", encoding="utf-8") as file:
-            json.dump(self.apis, file, ensure_ascii=False, indent=4)
+        tmp_file = f"{self.apis_file}.tmp"
+        with open(tmp_file, "wb") as file:
+            file.write(payload)
+        os.replace(tmp_file, self.apis_file)
+        self._last_save_hash = payload_hash
 
     def add_api(self, api_info: dict):
         """添加或更新一个API功能"""
@@ -71,6 +220,7 @@ class APIManager:
             return
         self.apis[name] = api_info
         self._save_data()
+        self._rebuild_index()
         logger.info(f"已添加/更新API功能: {name}")
 
     def remove_api(self, name: str):
@@ -78,6 +228,7 @@ class APIManager:
         if name in self.apis:
             del self.apis[name]
             self._save_data()
+            self._rebuild_index()
             logger.info(f"已删除API功能: {name}")
         else:
             logger.warning(f"API功能 '{name}' 不存在")
@@ -91,20 +242,14 @@ class APIManager:
         :param full_url: 完整的API请求地址
         :return: API站点域名
         """
-        parsed = urlparse(full_url)
-        return (
-            f"{parsed.scheme}://{parsed.netloc}"
-            if parsed.scheme and parsed.netloc
-            else full_url
-        )
+        return _extract_base_url(full_url)
 
     def get_apis_names(self):
         """获取所有API的名称（返回所有API的key）"""
         return list(self.apis.keys())
 
-    def normalize_api_data(self, name: str) -> dict:
-        """标准化 API 配置，返回深拷贝，避免被外部修改"""
-        raw_api = self.apis.get(name, {})
+    def _normalize_raw(self, name: str, raw_api: dict) -> dict:
+        """标准化单条原始API配置，仅在索引重建时调用"""
         url = raw_api.get("url", "")
         urls = [url] if isinstance(url, str) else url
 
@@ -112,16 +257,38 @@ class APIManager:
         if api_type not in self.ALLOWED_TYPES:
             api_type = self.default_api_type
 
-        normalized = {
+        return {
             "name": name,
-            "urls": urls,
+            "urls": list(urls),
+            # 预解析各请求地址的域名，供禁用站点检查直接做集合运算
+            "netlocs": tuple(urlparse(u).netloc for u in urls),
             "type": api_type,
-            "params": raw_api.get("params", {}) or {},
+            "params": dict(raw_api.get("params") or {}),
             "target": raw_api.get("target", ""),
             "fuzzy": raw_api.get("fuzzy", False),
             "priority": raw_api.get("priority", 0),  # 优先级支持，默认0
         }
-        return copy.deepcopy(normalized)
+
+    def normalize_api_data(self, name: str) -> dict | None:
+        """获取标准化的 API 配置，返回独立副本，避免被外部修改"""
+        base = self._normalized.get(name)
+        if base is None:
+            return None
+        # 嵌套值均为不可变类型，浅拷贝list/dict即等效于深拷贝
+        return {**base, "urls": list(base["urls"]), "params": dict(base["params"])}
+
+    def _fuzzy_hits(self, msg: str) -> list[tuple[int, str]]:
+        """收集模糊匹配命中；自动机可用时对消息做单次线性扫描，否则逐关键词子串查找"""
+        if self._fuzzy_automaton is not None:
+            hits: list[tuple[int, str]] = []
+            for _, entries in self._fuzzy_automaton.iter(msg):
+                hits.extend(entries)
+            return hits
+        return [
+            (priority, name)
+            for kw, priority, name in self._fuzzy_keywords
+            if kw in msg
+        ]
 
     def match_api_by_name(self, msg: str) -> dict | None:
         """
@@ -130,38 +297,28 @@ class APIManager:
         :param msg: 触发词
         :return: 匹配的API功能数据，如果未匹配则返回None
         """
-        matches = []
-        
-        for key, raw_api in self.apis.items():
-            keywords = raw_api.get("keyword", [])
-            if isinstance(keywords, str):
-                keywords = [keywords]
+        # 缓存命中：直接在候选列表上随机选择
+        cached = self._match_cache.get(msg, _CACHE_MISS)
+        if cached is not _CACHE_MISS:
+            return self.normalize_api_data(random.choice(cached)) if cached else None
+
+        # 精准匹配：索引直查；模糊匹配：自动机/关键词扫描
+        hits = list(self._exact_index.get(msg, []))
+        hits.extend(self._fuzzy_hits(msg))
+
+        # 简单限容：超出上限整体清空，避免无界增长（未命中也会写缓存）
+        if len(self._match_cache) > 512:
+            self._match_cache.clear()
 
-            matched = False
-            # 精准匹配
-            if msg in keywords:
-                matched = True
-            # 模糊匹配
-            elif raw_api.get("fuzzy", False) and any(k in msg for k in keywords):
-                matched = True
-
-            if matched:
-                priority = raw_api.get("priority", 0)
-                matches.append((priority, key, raw_api))
-        
-        if not matches:
+        if not hits:
+            self._match_cache[msg] = None
             return None
-        
-        # 按优先级排序（数字越大优先级越高），相同优先级时随机选择
-        matches.sort(key=lambda x: x[0], reverse=True)
-        
-        # 获取最高优先级的匹配（可能有多个相同优先级）
-        max_priority = matches[0][0]
-        same_priority_matches = [m for m in matches if m[0] == max_priority]
-        
-        # 相同优先级时随机选择一个
-        selected = random.choice(same_priority_matches)
-        return self.normalize_api_data(selected[1])
+
+        # 取最高优先级（数字越大优先级越高），相同优先级时随机选择
+        max_priority = max(hits, key=itemgetter(0))[0]
+        candidates = list({name for priority, name in hits if priority == max_priority})
+        self._match_cache[msg] = candidates
+        return self.normalize_api_data(random.choice(candidates))
     
     def find_api_matches(self, msg: str) -> list[tuple[int, str, dict]]:
         """
@@ -170,24 +327,17 @@ class APIManager:
         :param msg: 触发词
         :return: (优先级, 触发词, API功能数据) 的列表
         """
-        matches = []
-        
-        for key, raw_api in self.apis.items():
-            keywords = raw_api.get("keyword", [])
-            if isinstance(keywords, str):
-                keywords = [keywords]
-
-            matched = False
-            # 精准匹配或模糊匹配
-            if msg in keywords or (raw_api.get("fuzzy", False) and any(k in msg for k in keywords)):
-                matched = True
-
-            if matched:
-                priority = raw_api.get("priority", 0)
-                matches.append((priority, key, raw_api))
-        
+        # 精准匹配 + 模糊匹配，按触发词去重
+        seen: dict[str, int] = {}
+        for priority, name in self._exact_index.get(msg, []):
+            seen.setdefault(name, priority)
+        for priority, name in self._fuzzy_hits(msg):
+            if name not in seen:
+                seen[name] = priority
+
+        matches = [(priority, name, self.apis[name]) for name, priority in seen.items()]
         # 按优先级排序
-        matches.sort(key=lambda x: x[0], reverse=True)
+        matches.sort(key=itemgetter(0), reverse=True)
         return matches
 
     def list_api(self):
@@ -195,21 +345,12 @@ class APIManager:
         根据API功能字典生成分类字符串，即API功能列表。
         按数据类型（text/image/video/audio）分类展示。
         """
-        # 用 ALLOWED_TYPES 初始化分类字典
-        api_types = {t: [] for t in self.ALLOWED_TYPES}
-
-        # 遍历apis字典，按type分类
-        for key, value in self.apis.items():
-            api_type = value.get("type", "unknown")
-            if api_type in api_types:
-                api_types[api_type].append(key)
-
-        # 生成最终字符串
+        # 直接读取索引重建时的类型分桶
         result = f"----共收录了{len(self.apis)}个API功能----\n\n"
-        for api_type in api_types:
-            if api_types[api_type]:
-                result += f"【{api_type}】{len(api_types[api_type])}个：\n"
-                for key in api_types[api_type]:
+        for api_type, names in self._by_type.items():
+            if names:
+                result += f"【{api_type}】{len(names)}个：\n"
+                for key in names:
                     result += f"{key}、"
             result += "\n\n"
 
@@ -244,52 +385,12 @@ class APIManager:
         """
         api_info = {}
 
-        lines = detail.splitlines()
-        for line in lines:
-            if line.startswith("API触发词：") or line.startswith("api匹配词："):
-                kw = line.replace("API触发词：", "").replace("api匹配词：", "").strip()
-                if kw == "无":
-                    api_info["keyword"] = []
-                else:
-                    # 如果 kw 是形如 "['xxx']" 的字符串，先转回 list
-                    if (kw.startswith("[") and kw.endswith("]")):
-                        try:
-                            parsed = ast.literal_eval(kw)
-                            if isinstance(parsed, list):
-                                api_info["keyword"] = parsed
-                            else:
-                                api_info["keyword"] = [kw]
-                        except Exception:
-                            api_info["keyword"] = [kw]
-                    else:
-                        # 普通逗号分隔
-                        api_info["keyword"] = [k.strip() for k in kw.split(",")]
-
-            elif line.startswith("请求地址：") or line.startswith("api地址："):
-                url = line.replace("请求地址：", "").replace("api地址：", "").strip()
-                api_info["url"] = "" if url == "无" else url
-
-            elif line.startswith("数据类型：") or line.startswith("api类型："):
-                api_type = line.replace("数据类型：", "").replace("api类型：", "").strip()
-                api_info["type"] = "" if api_type == "无" else api_type
-
-            elif line.startswith("所需参数："):
-                params_str = line.replace("所需参数：", "").strip()
-                if params_str == "无":
-                    api_info["params"] = {}
-                else:
-                    params = {}
-                    for kv in params_str.split(","):
-                        if "=" in kv:
-                            k, v = kv.split("=", 1)
-                            params[k.strip()] = v.strip()
-                        else:
-                            params[kv.strip()] = ""
-                    api_info["params"] = params
-
-            elif line.startswith("解析路径："):
-                target = line.replace("解析路径：", "").strip()
-                api_info["target"] = "" if target == "无" else target
+        for line in detail.splitlines():
+            m = _FIELD_RE.match(line)
+            if not m:
+                continue
+            key, handler = _FIELD_HANDLERS[m.group(1)]
+            api_info[key] = handler(m.group(2).strip())
 
         return api_info
 
@@ -1,5 +1,6 @@
 from bs4 import BeautifulSoup
 import asyncio
+import json
 from collections import defaultdict
 from typing import Optional, Union
 import aiohttp
@@ -8,9 +9,40 @@ from astrbot.core.config.astrbot_config import AstrBotConfig
 from .api_manager import APIManager
 from .utils import dict_to_string, extract_url, get_nested_value, parse_api_keys
 
+try:
+    from selectolax.parser import HTMLParser  # 可选依赖，纯文本提取远快于完整建树
+except ImportError:
+    HTMLParser = None
+
+try:
+    import orjson  # 可选依赖，JSON解析速度远快于标准库
+except ImportError:
+    orjson = None
+
+
+def _html_to_text(html: str) -> str:
+    """提取HTML中的文本内容"""
+    if HTMLParser is not None:
+        body = HTMLParser(html).body
+        if body is not None:
+            return body.text(separator=" ", strip=True)
+    return BeautifulSoup(html, "html.parser").get_text(strip=True)
+
+
+def _looks_like_html(text: str) -> bool:
+    """判断字符串是否为HTML页面（兼容无DOCTYPE声明的页面）"""
+    head = text.lstrip()[:9].lower()
+    return head.startswith("<!doctype") or head.startswith("<html")
+
+
 class RequestManager:
     def __init__(self, config: AstrBotConfig, api_manager: APIManager) -> None:
-        self.session = aiohttp.ClientSession()
+        # 复用连接与DNS解析结果：小JSON接口的耗时主要在TLS握手和DNS
+        connector = aiohttp.TCPConnector(
+            limit=128, limit_per_host=8, ttl_dns_cache=300, enable_cleanup_closed=True
+        )
+        self._timeout = aiohttp.ClientTimeout(total=30)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
         # api密钥字典（从列表格式解析）
         api_keys_list = config.get("api_keys", [])
         self.api_key_dict = parse_api_keys(api_keys_list)
@@ -23,15 +55,17 @@ class RequestManager:
         last_exc = None
         for u in urls:
             try:
-                async with self.session.get(u, params=params, timeout=30) as resp:
+                async with self.session.get(u, params=params) as resp:
                     resp.raise_for_status()
                     if test_mode:
                         return
-                    ct = resp.headers.get("Content-Type", "").lower()
-                    if "application/json" in ct:
-                        return await resp.json()
-                    if "text/" in ct:
-                        return (await resp.text()).strip()
+                    ct = resp.content_type or ""  # aiohttp已解析并小写化mimetype
+                    if ct == "application/json":
+                        body = await resp.read()
+                        return orjson.loads(body) if orjson is not None else json.loads(body)
+                    if ct.startswith("text/"):
+                        body = await resp.read()
+                        return body.decode(resp.charset or "utf-8").strip()
                     return await resp.read()
             except Exception as e:
                 last_exc = e
@@ -53,7 +87,7 @@ class RequestManager:
         # data为URL时，下载数据
         if isinstance(data, str) and api_type != "text":
             if url := extract_url(data):
-                downloaded = await self.request(urls)
+                downloaded = await self.request([url])
                 if isinstance(downloaded, bytes):
                     data = downloaded
                 else:
@@ -68,10 +102,8 @@ class RequestManager:
                 data = nested_value
 
         # data为HTML字符串时，解析HTML
-        if isinstance(data, str) and data.strip().startswith("<!DOCTYPE html>"):
-            soup = BeautifulSoup(data, "html.parser")
-            # 提取HTML中的文本内容
-            data = soup.get_text(strip=True)
+        if isinstance(data, str) and _looks_like_html(data):
+            data = _html_to_text(data)
 
         text = data if isinstance(data, str) else None
         byte = data if isinstance(data, bytes) else None
@@ -81,7 +113,7 @@ class RequestManager:
     async def batch_test_apis(self) -> tuple[list[str], list[str]]:
         """
         批量测试所有API功能的可用性。
-        将每个请求地址按API站点分组；每轮从每个站点取一个地址并发测试。
+        所有请求地址一次性并发调度，每个API站点用信号量限制同时只测一个地址。
         返回 (可用的API功能列表, 失效的API功能列表)
         """
         # 1) 展平每个API功能的所有请求地址 -> 按站点分组
@@ -102,27 +134,27 @@ class RequestManager:
         # 2) 记录每个API功能是否已成功（任一请求地址成功即为成功）
         api_succeeded = dict.fromkeys(self.api.apis.keys(), False)
 
-        # 3) 按轮次从每个站点各取一个请求地址并发测试，直到所有站点的测试项列表空
-        while any(site_to_entries.values()):
-            batch = []
-            for site, entries in list(site_to_entries.items()):
-                while entries:
-                    batch.append(entries.pop(0))
-                    break
+        # 3) 全部并发测试，按站点串行（信号量=1），站点之间互不等待
+        site_sems = {site: asyncio.Semaphore(1) for site in site_to_entries}
 
-            if not batch:
-                break  # 没有需要测试的项目了
-
-            # 并发测试这一轮的所有请求地址
-            tasks = [self.request([e["url"]], e["params"], True) for e in batch]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 处理结果：任何非 Exception 的返回都视为成功
-            for entry, res in zip(batch, results):
-                if isinstance(res, Exception):
-                    pass
-                else:
+        async def _probe(site: str, entry: dict):
+            async with site_sems[site]:
+                # 该API功能已有地址测试成功，跳过剩余地址，节省带宽
+                if api_succeeded[entry["api_name"]]:
+                    return
+                try:
+                    await self.request([entry["url"]], entry["params"], True)
                     api_succeeded[entry["api_name"]] = True
+                except Exception:
+                    pass
+
+        tasks = [
+            _probe(site, entry)
+            for site, entries in site_to_entries.items()
+            for entry in entries
+        ]
+        if tasks:
+            await asyncio.gather(*tasks)
 
         # 4) 汇总：返回可用的和失效的API功能列表
         abled = [k for k, v in api_succeeded.items() if v]
@@ -1,5 +1,8 @@
+import asyncio
 import os
+import re
 from pathlib import Path
+from urllib.parse import urlparse
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register, StarTools
 from astrbot.api.provider import ProviderRequest, LLMResponse
@@ -19,19 +22,33 @@ from .core.api_manager import APIManager
 from .core.utils import get_nickname
 from .core.request import RequestManager
 
+# LLM回复中的API调用标记，如[[讲个笑话]]
+_LLM_API_RE = re.compile(r"\[\[([^\]]+)\]\]")
+
 
 @register("astrbot_plugin_apis_fork", "Kx501", "API聚合插件", "...", "...")
 class APIsPlugin(Star):
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         self.conf = config
-        # 启用的 API 类型（直接从列表获取）
-        self.enable_api_type = config.get("enabled_types", ["text", "image", "video", "audio"])
+        # 启用的 API 类型（转为frozenset，热路径上的成员判断O(1)）
+        self.enable_api_type = frozenset(
+            config.get("enabled_types", ["text", "image", "video", "audio"])
+        )
         # 本地数据存储路径
         self.local_data_dir = StarTools.get_data_dir("astrbot_plugin_apis_fork")
         # api数据文件
         self.system_api_file = Path(__file__).parent / "system_api.json"
         self.apis_file = self.local_data_dir / "apis.json"
+        # 禁用站点的netloc集合缓存（配置变化时重建）
+        self._disabled_sites_raw: list | None = None
+        self._disabled_netlocs: set[str] = set()
+        # 禁用API功能的集合缓存（配置变化时重建）
+        self._disabled_apis_raw: list | None = None
+        self._disabled_apis_set: frozenset[str] = frozenset()
+        # 注入提示词用的触发词列表缓存（随API数据版本失效）
+        self._api_list_cache: str | None = None
+        self._api_list_version: int = -1
 
     async def initialize(self):
         self.local = LocalDataManager(self.local_data_dir)
@@ -153,33 +170,39 @@ class APIsPlugin(Star):
         if self.conf["prefix_mode"] and not event.is_at_or_wake_command:
             return
 
-        # 匹配api
-        msgs = event.message_str.split(" ")
-        api_data = self.api.match_api_by_name(msgs[0])
+        # 匹配api（只切出首词，剩余部分延后再分）
+        head, _, tail = event.message_str.partition(" ")
+        api_data = self.api.match_api_by_name(head)
         if not api_data:
             return
 
         # 检查API功能是否被禁用
         disabled_apis = self.conf.get("disabled_apis", [])
-        if api_data["name"] in disabled_apis:
+        if disabled_apis != self._disabled_apis_raw:
+            self._disabled_apis_raw = list(disabled_apis)
+            self._disabled_apis_set = frozenset(disabled_apis)
+        if api_data["name"] in self._disabled_apis_set:
             logger.debug(f"API功能 [{api_data['name']}] 已被禁用")
             return
 
-        # 检查API站点是否被禁用
+        # 检查API站点是否被禁用（按域名集合一次判断）
         disabled_sites = self.conf.get("disabled_sites", [])
-        for url in api_data["urls"]:
-            for site in disabled_sites:
-                if site and url.startswith(site):
-                    logger.debug(f"API站点 [{site}] 已被禁用，跳过URL: {url}")
-                    return
+        if disabled_sites != self._disabled_sites_raw:
+            self._disabled_sites_raw = list(disabled_sites)
+            self._disabled_netlocs = {
+                urlparse(site).netloc or site for site in disabled_sites if site
+            }
+        if self._disabled_netlocs.intersection(api_data["netlocs"]):
+            logger.debug(f"API站点已被禁用，跳过API功能 [{api_data['name']}]")
+            return
 
         # 检查API数据类型是否被禁用
         if api_data["type"] not in self.enable_api_type:
             logger.debug(f"API数据类型 [{api_data['type']}] 已被禁用")
             return
 
-        # 获取参数
-        args = msgs[1:]
+        # 获取参数（无参split还会合并连续空白、跳过空串）
+        args = tail.split() if tail else []
 
         # 参数补充
         args, params = await self._supplement_args(event, args, api_data["params"])
@@ -272,18 +295,13 @@ class APIsPlugin(Star):
 
     def _generate_api_list(self) -> str:
         """生成精简的API触发词列表，用于提示词注入（优化token消耗）"""
-        api_names = []
-        
-        for api_name, api_data in self.api.apis.items():
-            api_type = api_data.get("type", "text")
-            if api_type in self.enable_api_type:
-                keywords = api_data.get("keyword", [])
-                if isinstance(keywords, str):
-                    keywords = [keywords]
-                # 只取第一个关键词作为代表
-                if keywords:
-                    api_names.append(keywords[0])
-        
+        # 首关键词与类型已在索引重建时预提取，这里只做类型过滤
+        api_names = [
+            keyword
+            for keyword, api_type in self.api._first_keywords
+            if api_type in self.enable_api_type
+        ]
+
         # 返回简洁的逗号分隔列表（最多50个，避免过长）
         if api_names:
             return ",".join(api_names[:50])
@@ -292,7 +310,11 @@ class APIsPlugin(Star):
     @filter.on_llm_request()
     async def inject_api_list(self, event: AstrMessageEvent, req: ProviderRequest):
         """在系统提示词中注入API触发词列表（使用符号包裹格式）"""
-        api_list = self._generate_api_list()
+        # API数据未变化时直接复用缓存的列表字符串
+        if self._api_list_cache is None or self._api_list_version != self.api.version:
+            self._api_list_cache = self._generate_api_list()
+            self._api_list_version = self.api.version
+        api_list = self._api_list_cache
         if api_list:
             req.system_prompt += f"""
 
@@ -308,8 +330,6 @@ class APIsPlugin(Star):
     @filter.on_llm_response()
     async def extract_api_from_response(self, event: AstrMessageEvent, resp: LLMResponse):
         """从LLM回复中提取[[触发词]]格式并调用对应的API功能，将结果整合到回复中"""
-        import re
-        
         # 获取回复文本：优先从completion_text获取
         reply_text = ""
         
@@ -327,46 +347,60 @@ class APIsPlugin(Star):
         
         logger.debug(f"extract_api_from_response: 开始处理回复文本: {reply_text[:200]}...")
         
-        # 提取所有[[...]]包裹的内容
-        pattern = r'\[\[([^\]]+)\]\]'
-        matches = re.findall(pattern, reply_text)
-        
+        # 提取所有[[...]]包裹的内容，按出现顺序去重
+        matches = list(
+            dict.fromkeys(
+                stripped
+                for m in _LLM_API_RE.finditer(reply_text)
+                if (stripped := m.group(1).strip())
+            )
+        )
+
         if not matches:
             logger.debug("extract_api_from_response: 未找到[[...]]格式的API调用")
             return
         
         logger.debug(f"extract_api_from_response: 找到 {len(matches)} 个API调用标记: {matches}")
         
-        # 防重复：记录已调用的API
-        called_apis = set()
-        api_results = []  # 存储API调用结果
-        
-        # 对每个提取的内容，尝试匹配并调用API
+        # 先完成匹配与过滤，再并发调用
+        call_targets = []
         for api_name in matches:
-            api_name = api_name.strip()
-            if not api_name or api_name in called_apis:
-                continue
-            
             # 匹配API功能（支持优先级选择）
             logger.debug(f"extract_api_from_response: 尝试匹配API功能，触发词='{api_name}'")
             api_data = self.api.match_api_by_name(api_name)
             if not api_data:
                 logger.warning(f"extract_api_from_response: 未找到匹配的API功能，触发词='{api_name}'")
                 continue
-            
+
             logger.debug(f"extract_api_from_response: 匹配到API功能 '{api_data['name']}'，类型={api_data['type']}")
-            
+
             # 检查API数据类型是否启用
             if api_data["type"] not in self.enable_api_type:
                 logger.warning(f"extract_api_from_response: API数据类型 [{api_data['type']}] 已被禁用，启用的类型={self.enable_api_type}")
                 continue
-            
-            called_apis.add(api_name)
-            
-            try:
-                # 调用API获取数据
-                text, path, source = await self.call_api(api_data, None)
-                
+
+            call_targets.append((api_name, api_data))
+
+        api_results = []  # 存储API调用结果
+        if call_targets:
+            # 并发获取数据，限制并发数避免压垮单个站点
+            semaphore = asyncio.Semaphore(4)
+
+            async def _call(api_data: dict):
+                async with semaphore:
+                    return await self.call_api(api_data, None)
+
+            results = await asyncio.gather(
+                *(_call(api_data) for _, api_data in call_targets),
+                return_exceptions=True,
+            )
+
+            for (api_name, api_data), result in zip(call_targets, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"调用API功能失败 [{api_name}]: {result}")
+                    continue
+
+                text, path, source = result
                 if text or path:
                     # 添加API结果到消息链
                     api_chain = await self.data_to_chain(
@@ -374,15 +408,13 @@ class APIsPlugin(Star):
                     )
                     if api_chain:
                         api_results.extend(api_chain)
-                    
+
                     logger.info(f"已从回复中提取并调用API功能 [{api_name}]")
-            except Exception as e:
-                logger.error(f"调用API功能失败 [{api_name}]: {e}")
         
         # 如果有API结果，整合到回复中
         if api_results:
             # 从回复文本中移除[[...]]标记
-            cleaned_text = re.sub(pattern, '', reply_text).strip()
+            cleaned_text = _LLM_API_RE.sub('', reply_text).strip()
             
             # 确保result_chain存在
             if not resp.result_chain: